@@ -14,13 +14,14 @@ from pydantic import BaseModel
 from langchain_core.runnables import RunnableConfig
 
 from orders.graph import graph
-from orders.checkpointer import setup_checkpointer, cleanup_checkpointer
+from orders.checkpointer import setup_checkpointer, start_dispatcher, cleanup_checkpointer
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Initialize checkpointer on startup, cleanup on shutdown."""
+    """Initialize checkpointer and dispatcher on startup, cleanup on shutdown."""
     setup_checkpointer()
+    start_dispatcher()
     yield
     cleanup_checkpointer()
 
@@ -3,6 +3,9 @@ PostgreSQL Checkpointer Setup
 
 Provides a globally-accessible checkpointer that can be used anywhere
 (CLI, FastAPI endpoints, etc.) with connection pooling for efficiency.
+
+Also owns the fulfillment dispatcher, since it shares the same pool and
+drains the order outbox written by the checkpointer.
 """
 
 import os
@@ -11,6 +14,9 @@ from psycopg import Connection
 from psycopg_pool import ConnectionPool
 from langgraph.checkpoint.postgres import PostgresSaver
 
+from orders.outbox import OutboxPostgresSaver, setup_outbox
+from orders.fulfillment import OutboxDispatcher, FileSink
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -23,16 +29,26 @@ if not POSTGRES_CONNECTION_STRING:
         "Please add it to your .env file."
     )
 
+# Local stand-in for the kitchen/fulfillment system
+# Relative to the working directory - never write next to the installed package
+FULFILLMENT_FILE = os.getenv("FULFILLMENT_FILE", "fulfillment_orders.jsonl")
+
 # Create a connection pool for concurrent access
 _pool = ConnectionPool(conninfo=POSTGRES_CONNECTION_STRING)
 
 # Create the checkpointer using the pool
-checkpointer = PostgresSaver(conn=_pool)
+# Confirmed orders are written to the outbox in the same transaction
+checkpointer = OutboxPostgresSaver(conn=_pool)
+
+# Background worker that sends outbox orders to fulfillment
+# It gets its own single-connection pool so it never takes connections from checkout
+_dispatcher_pool = ConnectionPool(conninfo=POSTGRES_CONNECTION_STRING, min_size=1, max_size=1)
+dispatcher = OutboxDispatcher(_dispatcher_pool, FileSink(FULFILLMENT_FILE))
 
 
 def setup_checkpointer():
     """
-    Initialize the checkpoint tables in PostgreSQL.
+    Initialize the checkpoint and outbox tables in PostgreSQL.
     Call this once at application startup (e.g., in FastAPI lifespan).
 
     Uses a separate autocommit connection because CREATE INDEX CONCURRENTLY
@@ -41,11 +57,26 @@ def setup_checkpointer():
     with Connection.connect(POSTGRES_CONNECTION_STRING, autocommit=True) as conn:
         temp_saver = PostgresSaver(conn=conn)
         temp_saver.setup()
+        setup_outbox(conn)
+
+
+def start_dispatcher():
+    """
+    Start draining the order outbox in the background.
+    Call this after setup_checkpointer().
+    """
+    dispatcher.start()
 
 
 def cleanup_checkpointer():
     """
-    Close the connection pool.
+    Stop the dispatcher and close the connection pools.
     Call this at application shutdown.
+
+    If the dispatcher is stuck in a slow sink call, its pool is left open
+    so the thread can still record the result; it's a daemon thread, so
+    it won't keep the process alive.
     """
+    if dispatcher.stop():
+        _dispatcher_pool.close()
     _pool.close()
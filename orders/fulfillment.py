@@ -0,0 +1,315 @@
+"""
+Fulfillment Dispatcher - Drains the order outbox in batches
+
+Runs in a background thread so checkout latency never depends on how slow
+fulfillment is. Orders are delivered at-least-once: a row is only marked
+dispatched after the sink accepts it, so a crash or sink error means the
+order is sent again later. Sinks should dedupe on order_id.
+
+Each batch is a lease, not a long-held lock:
+    1. Short transaction: claim due rows with a fresh lease_id and push
+       next_attempt_at past the lease, then commit
+    2. Call the sink with no connection held
+    3. Short transaction: mark rows dispatched, or schedule a retry -
+       only for rows that still carry our lease_id
+
+If a lease expires mid-send, another dispatcher can claim the rows; the
+late results of the first one are then ignored (the order may be sent
+twice, which at-least-once allows).
+
+If the batch fails, its orders are retried one at a time so only the bad
+ones are penalised. The fallback stops early if the sink looks down or
+the lease is running out.
+
+By default orders are retried forever with capped backoff. Setting
+max_attempts dead-letters orders that run out (failed_at is set); put
+them back in the queue with requeue_failed() once the problem is fixed:
+
+    from orders.checkpointer import dispatcher
+    requeue_failed(dispatcher.pool)                 # all dead-lettered orders
+    requeue_failed(dispatcher.pool, ["3f2a..."])    # specific orders
+
+Sinks are pluggable - anything with a send(orders) method works:
+    - FileSink: appends JSON lines to a local file (default stand-in)
+    - QueueSink: puts orders on an in-memory queue.Queue (handy for tests)
+    - In production this would be the kitchen/fulfillment API
+"""
+
+import json
+import logging
+import queue
+import threading
+import time
+import uuid
+from typing import Protocol
+
+from psycopg_pool import ConnectionPool
+
+
+logger = logging.getLogger(__name__)
+
+# Lease a batch of due rows. SKIP LOCKED lets several dispatchers run
+# side by side without grabbing the same orders, and the lease keeps
+# them from re-claiming rows another dispatcher is still sending.
+CLAIM_BATCH_SQL = """
+UPDATE order_outbox
+SET lease_id = %s,
+    next_attempt_at = now() + make_interval(secs => %s::float8)
+WHERE order_id IN (
+    SELECT order_id
+    FROM order_outbox
+    WHERE dispatched_at IS NULL
+      AND failed_at IS NULL
+      AND next_attempt_at <= now()
+    ORDER BY next_attempt_at
+    LIMIT %s
+    FOR UPDATE SKIP LOCKED
+)
+RETURNING order_id, payload
+"""
+
+MARK_DISPATCHED_SQL = """
+UPDATE order_outbox
+SET dispatched_at = now(), attempts = attempts + 1, last_error = NULL, lease_id = NULL
+WHERE order_id = ANY(%s)
+  AND lease_id = %s
+  AND dispatched_at IS NULL
+RETURNING order_id
+"""
+
+# Exponential backoff: retry_delay * 2^attempts, capped at max_retry_delay
+# (the exponent is capped too so power() can't overflow on long outages).
+# If max_attempts is set, the attempt that reaches it dead-letters the row.
+MARK_FAILED_SQL = """
+UPDATE order_outbox
+SET attempts = attempts + 1,
+    last_error = %s,
+    lease_id = NULL,
+    next_attempt_at = now() + make_interval(
+        secs => LEAST(%s::float8 * power(2, LEAST(attempts, 20)), %s::float8)
+    ),
+    failed_at = CASE WHEN attempts + 1 >= %s::integer THEN now() END
+WHERE order_id = %s
+  AND lease_id = %s
+  AND dispatched_at IS NULL
+RETURNING failed_at IS NOT NULL
+"""
+
+REQUEUE_FAILED_SQL = """
+UPDATE order_outbox
+SET failed_at = NULL, attempts = 0, last_error = NULL, lease_id = NULL, next_attempt_at = now()
+WHERE failed_at IS NOT NULL
+  AND dispatched_at IS NULL
+  AND (%s::text[] IS NULL OR order_id = ANY(%s::text[]))
+"""
+
+
+def requeue_failed(pool: ConnectionPool, order_ids: list[str] | None = None) -> int:
+    """
+    Put dead-lettered orders back in the queue with a fresh attempt count.
+
+    Requeues every dead-lettered order, or only order_ids if given.
+    Returns the number of orders requeued.
+    """
+    with pool.connection() as conn:
+        return conn.execute(REQUEUE_FAILED_SQL, (order_ids, order_ids)).rowcount
+
+
+class FulfillmentSink(Protocol):
+    """Where confirmed orders end up. Raise from send() to trigger a retry."""
+
+    def send(self, orders: list[dict]) -> None: ...
+
+
+class FileSink:
+    """Append each order as a JSON line to a local file."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def send(self, orders: list[dict]) -> None:
+        with open(self.path, "a") as f:
+            for order in orders:
+                f.write(json.dumps(order) + "\n")
+
+
+class QueueSink:
+    """Put each order on an in-memory queue."""
+
+    def __init__(self, q: queue.Queue | None = None):
+        self.queue = q if q is not None else queue.Queue()
+
+    def send(self, orders: list[dict]) -> None:
+        for order in orders:
+            self.queue.put(order)
+
+
+def deliver(
+    sink: FulfillmentSink,
+    orders: list[dict],
+    deadline: float | None = None,
+    max_consecutive_failures: int = 3,
+) -> tuple[list[str], dict[str, str]]:
+    """
+    Send orders to the sink, falling back to one at a time if the batch fails.
+
+    The fallback gives up early when:
+    - max_consecutive_failures single sends fail in a row - the sink looks
+      down rather than rejecting one bad order, so the rest are failed with
+      the batch error (and back off) instead of hammering it
+    - time.monotonic() passes deadline - the rest are left untouched and
+      get claimed again when the lease expires
+
+    Returns (sent order_ids, {order_id: error} for orders that failed).
+    """
+    try:
+        sink.send(orders)
+        return [order["order_id"] for order in orders], {}
+    except Exception as e:
+        batch_error = repr(e)
+        if len(orders) == 1:
+            return [], {orders[0]["order_id"]: batch_error}
+
+    sent = []
+    failed = {}
+    consecutive_failures = 0
+    for i, order in enumerate(orders):
+        if consecutive_failures >= max_consecutive_failures:
+            for rest in orders[i:]:
+                failed[rest["order_id"]] = batch_error
+            break
+        if deadline is not None and time.monotonic() >= deadline:
+            break
+        try:
+            sink.send([order])
+            sent.append(order["order_id"])
+            consecutive_failures = 0
+        except Exception as e:
+            failed[order["order_id"]] = repr(e)
+            consecutive_failures += 1
+    return sent, failed
+
+
+class OutboxDispatcher:
+    """
+    Background thread that moves orders from the outbox to a sink.
+
+    Give it its own pool so it never competes with checkout for connections.
+
+    Usage:
+        dispatcher = OutboxDispatcher(pool, FileSink("orders.jsonl"))
+        dispatcher.start()
+        ...
+        dispatcher.stop()
+    """
+
+    def __init__(
+        self,
+        pool: ConnectionPool,
+        sink: FulfillmentSink,
+        batch_size: int = 50,
+        poll_interval: float = 1.0,
+        lease_seconds: float = 60.0,
+        max_attempts: int | None = None,
+        retry_delay: float = 2.0,
+        max_retry_delay: float = 300.0,
+    ):
+        self.pool = pool
+        self.sink = sink
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def dispatch_batch(self) -> int:
+        """
+        Send one batch of due orders to the sink.
+
+        Returns the number of orders claimed (0 means nothing is due).
+        If the process dies mid-send, the lease expires and the orders
+        are claimed again.
+        """
+        lease_id = uuid.uuid4().hex
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                CLAIM_BATCH_SQL, (lease_id, self.lease_seconds, self.batch_size)
+            ).fetchall()
+        if not rows:
+            return 0
+
+        # Stop the one-at-a-time fallback with a fifth of the lease to spare,
+        # leaving time to record results before another dispatcher can claim
+        deadline = time.monotonic() + self.lease_seconds * 0.8
+
+        # No connection held while the (possibly slow) sink runs
+        sent, failed = deliver(self.sink, [payload for _, payload in rows], deadline)
+
+        with self.pool.connection() as conn:
+            if sent:
+                marked = conn.execute(MARK_DISPATCHED_SQL, (sent, lease_id)).fetchall()
+                if len(marked) < len(sent):
+                    logger.warning(
+                        "Lease expired for %d sent order(s); another dispatcher may resend them",
+                        len(sent) - len(marked),
+                    )
+            for order_id, error in failed.items():
+                row = conn.execute(
+                    MARK_FAILED_SQL,
+                    (error, self.retry_delay, self.max_retry_delay, self.max_attempts,
+                     order_id, lease_id),
+                ).fetchone()
+                if row is None:
+                    logger.warning("Lease expired for order %s; failure not recorded", order_id)
+                elif row[0]:
+                    logger.error(
+                        "Order %s dead-lettered after %d attempts: %s "
+                        "(use requeue_failed() to retry it)",
+                        order_id, self.max_attempts, error,
+                    )
+                else:
+                    logger.warning("Fulfillment dispatch failed for order %s: %s", order_id, error)
+
+        return len(rows)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                claimed = self.dispatch_batch()
+            except Exception:
+                # Database hiccup - keep the thread alive and try again later
+                logger.exception("Fulfillment dispatcher error")
+                claimed = 0
+
+            # A full batch means there's probably more waiting (lunch rush),
+            # so keep draining instead of sleeping
+            if claimed < self.batch_size:
+                self._stop.wait(self.poll_interval)
+
+    def start(self):
+        """Start draining the outbox in a daemon thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="fulfillment-dispatcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float | None = 5.0) -> bool:
+        """
+        Signal the thread to stop and wait for the current batch to finish.
+
+        Returns True once the thread has exited, False if it is still busy
+        (e.g. a slow sink call) after the timeout.
+        """
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                return False
+            self._thread = None
+        return True
@@ -16,7 +16,7 @@ import uuid
 from langchain_core.runnables import RunnableConfig
 
 from orders.graph import graph
-from orders.checkpointer import setup_checkpointer, cleanup_checkpointer
+from orders.checkpointer import setup_checkpointer, start_dispatcher, cleanup_checkpointer
 
 
 def main():
@@ -39,6 +39,9 @@ def main():
     # Initialize PostgreSQL checkpoint tables (idempotent - safe to call multiple times)
     setup_checkpointer()
 
+    # Send confirmed orders to fulfillment in the background
+    start_dispatcher()
+
     try:
         # Config ties this invocation to a specific thread/conversation
         # The checkpointer uses thread_id to store and retrieve state
@@ -1,3 +1,6 @@
+import uuid
+from datetime import datetime, timezone
+
 from orders.state import OrderState
 from orders.data import format_menu, find_item
 
@@ -79,11 +82,14 @@ def confirm_order(state: OrderState) -> dict:
     """
     Confirm and place the order.
 
-    In production this would:
+    The order is recorded in `placed_order`, which the checkpointer writes
+    to the outbox atomically with this checkpoint (see orders/outbox.py).
+    Fulfillment happens later in the background dispatcher, so checkout
+    never waits on it.
+
+    In production this would also:
     - Validate the order
     - Process payment
-    - Send to kitchen/fulfillment
-    - Return order confirmation number
     """
     cart = state.get("cart", [])
 
@@ -94,14 +100,26 @@ def confirm_order(state: OrderState) -> dict:
             "conversation_stage": "idle"
         }
 
-    # "Process" the order
     total = sum(item["price"] for item in cart)
     item_count = len(cart)
 
+    # Order record for the outbox - the full UUID is the outbox key,
+    # the short confirmation number is just for display
+    order_id = uuid.uuid4().hex
+    order = {
+        "order_id": order_id,
+        "confirmation_number": order_id[:8].upper(),
+        "items": cart,
+        "total": round(total, 2),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+
     # Clear the cart after order
     return {
         "cart": [],  # Clear cart
+        "placed_order": order,
         "bot_response": f"Order confirmed! You ordered {item_count} item(s) for ${total:.2f}.\n"
+                       f"Your confirmation number is {order['confirmation_number']}.\n"
                        f"Thank you for your order!\n\n"
                        f"Say 'menu' to start a new order.",
         "conversation_stage": "idle"
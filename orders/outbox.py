@@ -0,0 +1,85 @@
+"""
+Transactional Outbox for Confirmed Orders
+
+Confirming an order must not block on payment or kitchen/fulfillment calls.
+Instead, confirm_order puts the order into state as `placed_order`, and the
+checkpointer below writes it to the `order_outbox` table in the SAME
+transaction as the checkpoint. Either both the cleared cart and the outbox
+row are saved, or neither is.
+
+A background dispatcher (see orders/fulfillment.py) drains the table later.
+"""
+
+from psycopg import Connection
+from psycopg.types.json import Jsonb
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.postgres import PostgresSaver
+from langgraph.checkpoint.postgres._internal import get_connection
+
+
+CREATE_OUTBOX_SQL = """
+CREATE TABLE IF NOT EXISTS order_outbox (
+    order_id TEXT PRIMARY KEY,
+    thread_id TEXT NOT NULL,
+    payload JSONB NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    last_error TEXT,
+    -- Set by each claim so a dispatcher whose lease expired can't record results
+    lease_id TEXT,
+    dispatched_at TIMESTAMPTZ,
+    -- Set when an order runs out of delivery attempts (dead-lettered)
+    failed_at TIMESTAMPTZ
+);
+CREATE INDEX IF NOT EXISTS order_outbox_pending_idx
+    ON order_outbox (next_attempt_at)
+    WHERE dispatched_at IS NULL AND failed_at IS NULL;
+"""
+
+# No ON CONFLICT: replaying a checkpoint re-runs confirm_order, which
+# generates a fresh order_id, so a conflict can only mean a real bug.
+# Raising rolls back the checkpoint rather than silently losing the order.
+INSERT_ORDER_SQL = """
+INSERT INTO order_outbox (order_id, thread_id, payload)
+VALUES (%s, %s, %s)
+"""
+
+
+def setup_outbox(conn: Connection):
+    """Create the outbox table (idempotent - safe to call multiple times)."""
+    conn.execute(CREATE_OUTBOX_SQL)
+
+
+def enqueue_order(conn: Connection, thread_id: str, order: dict):
+    """Insert a confirmed order into the outbox using the caller's transaction."""
+    conn.execute(INSERT_ORDER_SQL, (order["order_id"], thread_id, Jsonb(order)))
+
+
+class OutboxPostgresSaver(PostgresSaver):
+    """
+    PostgresSaver that also writes newly placed orders to the outbox.
+
+    Works with a Connection or a ConnectionPool, like PostgresSaver. Each
+    put() that places an order opens one transaction and runs both the
+    checkpoint write and the outbox insert in it, so they commit (or roll
+    back) together.
+    """
+
+    def put(self, config: RunnableConfig, checkpoint, metadata, new_versions) -> RunnableConfig:
+        # Only the checkpoint from the step that wrote placed_order enqueues it.
+        # Later checkpoints still carry the value but don't list it as new.
+        order = checkpoint["channel_values"].get("placed_order")
+        if "placed_order" not in new_versions or not order:
+            return super().put(config, checkpoint, metadata, new_versions)
+
+        thread_id = config["configurable"]["thread_id"]
+
+        # Same lock + connection handling as PostgresSaver._cursor
+        with self.lock, get_connection(self.conn) as conn, conn.transaction():
+            # A saver bound to this single connection shares our transaction
+            saver = PostgresSaver(conn=conn, serde=self.serde)
+            next_config = saver.put(config, checkpoint, metadata, new_versions)
+            enqueue_order(conn, thread_id, order)
+
+        return next_config
@@ -30,3 +30,8 @@ class OrderState(TypedDict, total=False):
     # Warning shown when user has pending items and changes topic
     # Example: "Note: You have 2 item(s) in your cart."
     pending_action_warning: str | None
+
+    # Most recently confirmed order, written to the outbox with the checkpoint
+    # Example: {"order_id": "<uuid4 hex>", "confirmation_number": "3F2A9C1B",
+    #           "items": [...], "total": 12.98, "created_at": "..."}
+    placed_order: dict | None
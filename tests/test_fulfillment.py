@@ -0,0 +1,83 @@
+import time
+
+from orders.fulfillment import QueueSink, deliver
+
+
+class FlakySink:
+    """Rejects any batch containing a "bad" order, otherwise forwards to a queue."""
+
+    def __init__(self, bad_ids: set[str]):
+        self.bad_ids = bad_ids
+        self.inner = QueueSink()
+        self.calls = 0
+
+    def send(self, orders: list[dict]) -> None:
+        self.calls += 1
+        if any(order["order_id"] in self.bad_ids for order in orders):
+            raise RuntimeError("kitchen rejected order")
+        self.inner.send(orders)
+
+
+def _orders(*ids: str) -> list[dict]:
+    return [{"order_id": order_id} for order_id in ids]
+
+
+def _drain(sink: QueueSink) -> list[str]:
+    items = []
+    while not sink.queue.empty():
+        items.append(sink.queue.get_nowait()["order_id"])
+    return items
+
+
+def test_deliver_sends_whole_batch():
+    sink = QueueSink()
+    sent, failed = deliver(sink, _orders("a", "b", "c"))
+    assert sent == ["a", "b", "c"]
+    assert failed == {}
+    assert _drain(sink) == ["a", "b", "c"]
+
+
+def test_deliver_isolates_bad_order_in_failed_batch():
+    sink = FlakySink(bad_ids={"b"})
+    sent, failed = deliver(sink, _orders("a", "b", "c"))
+    assert sent == ["a", "c"]
+    assert list(failed) == ["b"]
+    assert "kitchen rejected order" in failed["b"]
+    assert _drain(sink.inner) == ["a", "c"]
+    # One batch attempt, then one attempt per order
+    assert sink.calls == 4
+
+
+def test_deliver_single_order_failure_is_not_retried():
+    sink = FlakySink(bad_ids={"a"})
+    sent, failed = deliver(sink, _orders("a"))
+    assert sent == []
+    assert list(failed) == ["a"]
+    assert sink.calls == 1
+
+
+class DownSink:
+    def __init__(self):
+        self.calls = 0
+
+    def send(self, orders: list[dict]) -> None:
+        self.calls += 1
+        raise TimeoutError("kitchen unreachable")
+
+
+def test_deliver_stops_fallback_when_sink_is_down():
+    sink = DownSink()
+    sent, failed = deliver(sink, _orders("a", "b", "c", "d", "e"), max_consecutive_failures=3)
+    assert sent == []
+    # Every order backs off, but only the batch + 3 single sends hit the sink
+    assert sorted(failed) == ["a", "b", "c", "d", "e"]
+    assert sink.calls == 4
+
+
+def test_deliver_stops_fallback_at_deadline():
+    sink = FlakySink(bad_ids={"b"})
+    sent, failed = deliver(sink, _orders("a", "b", "c"), deadline=time.monotonic() - 1)
+    # Nothing retried one by one - the lease is left to expire
+    assert sent == []
+    assert failed == {}
+    assert sink.calls == 1
@@ -0,0 +1,31 @@
+from orders.nodes import confirm_order
+
+
+CART = [
+    {"name": "Cheese Burger", "price": 9.99, "category": "Burgers"},
+    {"name": "Soda", "price": 2.99, "category": "Drinks"},
+]
+
+
+def test_confirm_order_places_order_and_clears_cart():
+    result = confirm_order({"cart": CART})
+
+    order = result["placed_order"]
+    assert result["cart"] == []
+    assert order["items"] == CART
+    assert order["total"] == 12.98
+    assert len(order["order_id"]) == 32  # full uuid4 hex
+    assert order["confirmation_number"] == order["order_id"][:8].upper()
+    assert order["confirmation_number"] in result["bot_response"]
+
+
+def test_confirm_order_generates_unique_ids():
+    first = confirm_order({"cart": CART})["placed_order"]
+    second = confirm_order({"cart": CART})["placed_order"]
+    assert first["order_id"] != second["order_id"]
+
+
+def test_confirm_empty_cart_places_nothing():
+    result = confirm_order({"cart": []})
+    assert "placed_order" not in result
+    assert "empty" in result["bot_response"]
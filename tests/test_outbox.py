@@ -0,0 +1,272 @@
+"""
+Postgres-backed tests for the outbox checkpointer and dispatcher.
+
+Skipped unless POSTGRES_CONNECTION_STRING is set. Each test runs in its own
+throwaway schema, so it never touches real checkpoints or orders.
+"""
+
+import logging
+import os
+import time
+import uuid
+
+import pytest
+
+POSTGRES_CONNECTION_STRING = os.getenv("POSTGRES_CONNECTION_STRING")
+if not POSTGRES_CONNECTION_STRING:
+    pytest.skip("POSTGRES_CONNECTION_STRING is not set", allow_module_level=True)
+
+pytest.importorskip("langgraph.checkpoint.postgres")
+
+from psycopg import Connection
+from psycopg.errors import UniqueViolation
+from psycopg.rows import dict_row
+from psycopg_pool import ConnectionPool
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.postgres import PostgresSaver
+
+from orders.outbox import OutboxPostgresSaver, enqueue_order, setup_outbox
+from orders.fulfillment import OutboxDispatcher, QueueSink, requeue_failed
+
+
+class FailingSink:
+    def send(self, orders: list[dict]) -> None:
+        raise RuntimeError("kitchen offline")
+
+
+@pytest.fixture
+def pool():
+    schema = f"outbox_test_{uuid.uuid4().hex[:8]}"
+    options = f"-c search_path={schema}"
+
+    with Connection.connect(POSTGRES_CONNECTION_STRING, autocommit=True) as conn:
+        conn.execute(f"CREATE SCHEMA {schema}")
+    with Connection.connect(POSTGRES_CONNECTION_STRING, autocommit=True, options=options) as conn:
+        PostgresSaver(conn=conn).setup()
+        setup_outbox(conn)
+
+    pool = ConnectionPool(conninfo=POSTGRES_CONNECTION_STRING, kwargs={"options": options}, open=True)
+    yield pool
+    pool.close()
+
+    with Connection.connect(POSTGRES_CONNECTION_STRING, autocommit=True) as conn:
+        conn.execute(f"DROP SCHEMA {schema} CASCADE")
+
+
+def _order(order_id: str | None = None) -> dict:
+    return {"order_id": order_id or uuid.uuid4().hex, "items": [], "total": 0.0}
+
+
+def _put(saver: PostgresSaver, thread_id: str, values: dict, new_channels: list[str]):
+    new_versions = {k: saver.get_next_version(None, None) for k in new_channels}
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = values
+    checkpoint["channel_versions"] = new_versions
+    config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    return saver.put(config, checkpoint, {}, new_versions)
+
+
+def _outbox_rows(pool: ConnectionPool, thread_id: str | None = None) -> list[dict]:
+    with pool.connection() as conn:
+        with conn.cursor(row_factory=dict_row) as cur:
+            if thread_id is None:
+                cur.execute("SELECT * FROM order_outbox")
+            else:
+                cur.execute("SELECT * FROM order_outbox WHERE thread_id = %s", (thread_id,))
+            return cur.fetchall()
+
+
+def _row(pool: ConnectionPool, order_id: str) -> dict:
+    with pool.connection() as conn:
+        with conn.cursor(row_factory=dict_row) as cur:
+            cur.execute(
+                "SELECT *, next_attempt_at > now() AS backing_off "
+                "FROM order_outbox WHERE order_id = %s",
+                (order_id,),
+            )
+            return cur.fetchone()
+
+
+# =============================================================================
+# OutboxPostgresSaver
+# =============================================================================
+
+def test_put_enqueues_newly_placed_order(pool):
+    saver = OutboxPostgresSaver(conn=pool)
+    order = _order()
+
+    _put(saver, "t1", {"placed_order": order, "cart": []}, ["placed_order", "cart"])
+
+    rows = _outbox_rows(pool, "t1")
+    assert [row["order_id"] for row in rows] == [order["order_id"]]
+    assert rows[0]["payload"] == order
+
+
+def test_put_skips_order_not_in_new_versions(pool):
+    saver = OutboxPostgresSaver(conn=pool)
+
+    # A later turn still carries placed_order in state but didn't write it
+    _put(saver, "t1", {"placed_order": _order(), "user_input": "menu"}, ["user_input"])
+
+    assert _outbox_rows(pool, "t1") == []
+
+
+def test_put_rolls_back_checkpoint_when_enqueue_fails(pool):
+    saver = OutboxPostgresSaver(conn=pool)
+    order = _order()
+    first = _put(saver, "t1", {"placed_order": order}, ["placed_order"])
+
+    # Same order_id again - the insert conflicts and must take the checkpoint with it
+    with pytest.raises(UniqueViolation):
+        _put(saver, "t1", {"placed_order": order}, ["placed_order"])
+
+    latest = saver.get_tuple({"configurable": {"thread_id": "t1", "checkpoint_ns": ""}})
+    assert latest.config["configurable"]["checkpoint_id"] == first["configurable"]["checkpoint_id"]
+    assert len(_outbox_rows(pool, "t1")) == 1
+
+
+def test_put_with_single_connection(pool):
+    with pool.connection() as conn:
+        conn.autocommit = True
+        saver = OutboxPostgresSaver(conn=conn)
+        order = _order()
+        _put(saver, "t1", {"placed_order": order}, ["placed_order"])
+
+    assert [row["order_id"] for row in _outbox_rows(pool, "t1")] == [order["order_id"]]
+
+
+# =============================================================================
+# OutboxDispatcher
+# =============================================================================
+
+def _enqueue(pool: ConnectionPool, *orders: dict):
+    with pool.connection() as conn:
+        for order in orders:
+            enqueue_order(conn, "t1", order)
+
+
+def test_dispatch_sends_batch_and_marks_dispatched(pool):
+    orders = [_order(), _order()]
+    _enqueue(pool, *orders)
+    sink = QueueSink()
+    dispatcher = OutboxDispatcher(pool, sink)
+
+    assert dispatcher.dispatch_batch() == 2
+    assert dispatcher.dispatch_batch() == 0
+
+    sent = [sink.queue.get_nowait() for _ in range(sink.queue.qsize())]
+    assert sorted(o["order_id"] for o in sent) == sorted(o["order_id"] for o in orders)
+    for order in orders:
+        row = _row(pool, order["order_id"])
+        assert row["dispatched_at"] is not None
+        assert row["attempts"] == 1
+
+
+def test_dispatch_failure_backs_off(pool):
+    order = _order()
+    _enqueue(pool, order)
+    dispatcher = OutboxDispatcher(pool, FailingSink(), max_attempts=3, retry_delay=60)
+
+    assert dispatcher.dispatch_batch() == 1
+    # Still backing off, so nothing is due yet
+    assert dispatcher.dispatch_batch() == 0
+
+    row = _row(pool, order["order_id"])
+    assert row["attempts"] == 1
+    assert "kitchen offline" in row["last_error"]
+    assert row["backing_off"]
+    assert row["dispatched_at"] is None
+    assert row["failed_at"] is None
+
+
+def test_dispatch_dead_letters_after_max_attempts(pool, caplog):
+    order = _order()
+    _enqueue(pool, order)
+    dispatcher = OutboxDispatcher(pool, FailingSink(), max_attempts=1)
+
+    with caplog.at_level(logging.ERROR, logger="orders.fulfillment"):
+        assert dispatcher.dispatch_batch() == 1
+
+    row = _row(pool, order["order_id"])
+    assert row["failed_at"] is not None
+    assert row["dispatched_at"] is None
+    assert "dead-lettered" in caplog.text
+
+
+def test_claimed_orders_are_leased_to_one_dispatcher(pool):
+    _enqueue(pool, _order())
+    other = OutboxDispatcher(pool, QueueSink())
+    claimed_by_other = []
+
+    class PeekingSink:
+        def send(self, orders):
+            # While we're sending, the lease hides the row from other dispatchers
+            claimed_by_other.append(other.dispatch_batch())
+
+    assert OutboxDispatcher(pool, PeekingSink()).dispatch_batch() == 1
+    assert claimed_by_other == [0]
+
+
+def test_default_dispatcher_never_dead_letters(pool):
+    order = _order()
+    _enqueue(pool, order)
+    dispatcher = OutboxDispatcher(pool, FailingSink(), retry_delay=0)
+
+    for _ in range(15):
+        assert dispatcher.dispatch_batch() == 1
+
+    row = _row(pool, order["order_id"])
+    assert row["attempts"] == 15
+    assert row["failed_at"] is None
+
+
+def test_requeue_failed_redrives_dead_letters(pool):
+    dead, other = _order(), _order()
+    _enqueue(pool, dead, other)
+    OutboxDispatcher(pool, FailingSink(), max_attempts=1).dispatch_batch()
+
+    assert requeue_failed(pool, [dead["order_id"]]) == 1
+
+    sink = QueueSink()
+    assert OutboxDispatcher(pool, sink).dispatch_batch() == 1
+    assert sink.queue.get_nowait()["order_id"] == dead["order_id"]
+    assert _row(pool, dead["order_id"])["attempts"] == 1
+    assert _row(pool, other["order_id"])["failed_at"] is not None
+
+    assert requeue_failed(pool) == 1
+
+
+class LeaseExpiringSink:
+    """Outlives its lease, lets another dispatcher take the order, then reports."""
+
+    def __init__(self, other: OutboxDispatcher, fail: bool):
+        self.other = other
+        self.fail = fail
+        self.reclaimed = None
+
+    def send(self, orders):
+        time.sleep(0.2)
+        self.reclaimed = self.other.dispatch_batch()
+        if self.fail:
+            raise RuntimeError("kitchen timed out")
+
+
+@pytest.mark.parametrize("fail", [True, False])
+def test_expired_lease_results_are_ignored(pool, fail):
+    order = _order()
+    _enqueue(pool, order)
+    other_sink = QueueSink()
+    other = OutboxDispatcher(pool, other_sink)
+    slow_sink = LeaseExpiringSink(other, fail=fail)
+    slow = OutboxDispatcher(pool, slow_sink, lease_seconds=0.05, max_attempts=1)
+
+    assert slow.dispatch_batch() == 1
+    assert slow_sink.reclaimed == 1
+    assert other_sink.queue.get_nowait()["order_id"] == order["order_id"]
+
+    # Only the dispatcher holding the current lease recorded a result
+    row = _row(pool, order["order_id"])
+    assert row["dispatched_at"] is not None
+    assert row["failed_at"] is None
+    assert row["attempts"] == 1
+    assert row["lease_id"] is None